@@ -5,7 +5,8 @@ This module provides functions to interact with First Orion's Branded Calling AP
 It handles authentication and push notifications needed for outbound calling applications.
 """
 
-import requests
+import asyncio
+import httpx
 import json
 from typing import Dict, Any, Optional, Tuple, TypedDict
 import time
@@ -21,10 +22,6 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('first_orion_api')
 
-# Suppress SSL warnings when verify=False is used
-import urllib3
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
 class AuthResponse(TypedDict):
     """Type definition for First Orion auth response"""
     token: str
@@ -40,7 +37,20 @@ PUSH_URL = "https://api.firstorion.com/exchange/v1/calls/push"
 API_KEY = os.environ.get("FIRST_ORION_API_KEY")
 API_SECRET = os.environ.get("FIRST_ORION_API_PASSWORD")
 
-def get_auth_token(correlation_id: str) -> Tuple[Optional[str], Optional[AuthResponse]]:
+# Shared client so auth and push requests reuse pooled keep-alive connections
+# Temporarily disable SSL verification for development environment
+client = httpx.AsyncClient(
+    limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+    timeout=10.0,
+    verify=False
+)
+
+# Refresh the cached auth token this many seconds before it expires
+TOKEN_REFRESH_MARGIN = 30
+_token_cache: Dict[str, Any] = {"token": None, "data": None, "expires_at": 0.0}
+_token_lock = asyncio.Lock()
+
+async def get_auth_token(correlation_id: str) -> Tuple[Optional[str], Optional[AuthResponse]]:
     """
     Get authentication token from First Orion API.
 
@@ -73,8 +83,7 @@ def get_auth_token(correlation_id: str) -> Tuple[Optional[str], Optional[AuthRes
 
     try:
         print(f"Making POST request to: {AUTH_URL}")
-        # Temporarily disable SSL verification for development environment
-        response = requests.post(AUTH_URL, headers=headers, data={}, verify=False)
+        response = await client.post(AUTH_URL, headers=headers)
 
         print(f"Response Status Code: {response.status_code}")
         print(f"Response Headers: {dict(response.headers)}")
@@ -110,7 +119,7 @@ def get_auth_token(correlation_id: str) -> Tuple[Optional[str], Optional[AuthRes
             logger.error("Authentication succeeded but no token in response")
             return None, response_data
 
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Authentication request failed: {str(e)}")
         # Record the failed auth in the call tracker
         call_tracker.record_auth_response(correlation_id, None)
@@ -123,7 +132,34 @@ def get_auth_token(correlation_id: str) -> Tuple[Optional[str], Optional[AuthRes
         return None, None
 
 
-def send_push_notification(correlation_id: str, token: str, a_number: str, b_number: str) -> Tuple[
+async def get_cached_auth_token(correlation_id: str) -> Tuple[Optional[str], Optional[AuthResponse]]:
+    """
+    Get a First Orion auth token, reusing the cached one until shortly before it expires.
+
+    Args:
+        correlation_id: ID to correlate this auth request with subsequent calls
+
+    Returns:
+        Same as get_auth_token()
+    """
+    if time.time() < _token_cache["expires_at"] - TOKEN_REFRESH_MARGIN:
+        call_tracker.record_auth_response(correlation_id, _token_cache["data"])
+        return _token_cache["token"], _token_cache["data"]
+
+    async with _token_lock:
+        # Another caller may have refreshed while we waited
+        if time.time() < _token_cache["expires_at"] - TOKEN_REFRESH_MARGIN:
+            call_tracker.record_auth_response(correlation_id, _token_cache["data"])
+            return _token_cache["token"], _token_cache["data"]
+
+        token, response_data = await get_auth_token(correlation_id)
+        if token:
+            expires_at = response_data.get('expires_at') or time.time() + response_data.get('expires_in', 0)
+            _token_cache.update(token=token, data=response_data, expires_at=float(expires_at))
+        return token, response_data
+
+
+async def send_push_notification(correlation_id: str, token: str, a_number: str, b_number: str) -> Tuple[
     bool, Optional[Dict[str, Any]]]:
     """
     Send a push notification to First Orion before making a call.
@@ -162,12 +198,13 @@ def send_push_notification(correlation_id: str, token: str, a_number: str, b_num
         "bNumber": formatted_b_number
     }
 
+    request_id = None
     try:
         print(f"Sending push notification: {formatted_a_number} → {formatted_b_number}")
         print(f"Push URL: {PUSH_URL}")
         print(f"Request payload: {json.dumps(payload)}")
 
-        response = requests.post(PUSH_URL, headers=headers, json=payload, verify=False)
+        response = await client.post(PUSH_URL, headers=headers, json=payload)
 
         # Extract request ID from headers for correlation if available
         request_id = response.headers.get('X-Forp-Meta-Request-Id')
@@ -182,12 +219,12 @@ def send_push_notification(correlation_id: str, token: str, a_number: str, b_num
 
         return True, response_data
 
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Push notification request failed: {str(e)}")
 
         # Try to get request ID from headers even if request failed
         request_id = None
-        if hasattr(e, 'response') and e.response is not None:
+        if isinstance(e, httpx.HTTPStatusError):
             request_id = e.response.headers.get('X-Forp-Meta-Request-Id')
 
             try:
@@ -200,7 +237,15 @@ def send_push_notification(correlation_id: str, token: str, a_number: str, b_num
         call_tracker.record_push_response(correlation_id, False, None, request_id)
 
         return False, None
-def first_orion_flow(a_number: str, b_number: str) -> Tuple[bool, str]:
+
+    except ValueError:
+        # json.JSONDecodeError from a non-JSON 2xx body (httpx doesn't wrap it)
+        logger.error("Failed to parse push notification response JSON")
+        call_tracker.record_push_response(correlation_id, False, None, request_id)
+        return False, None
+
+
+async def first_orion_flow(a_number: str, b_number: str) -> Tuple[bool, str]:
     """
     Complete First Orion flow: authenticate and send push notification.
 
@@ -217,13 +262,13 @@ def first_orion_flow(a_number: str, b_number: str) -> Tuple[bool, str]:
     correlation_id = call_tracker.start_auth_flow(b_number)
 
     # Step 1: Get authentication token
-    token, auth_data = get_auth_token(correlation_id)
+    token, auth_data = await get_cached_auth_token(correlation_id)
     if not token:
         logger.error("Cannot complete First Orion flow: authentication failed")
         return False, correlation_id
 
     # Step 2: Send push notification
-    success, push_data = send_push_notification(correlation_id, token, a_number, b_number)
+    success, push_data = await send_push_notification(correlation_id, token, a_number, b_number)
     if not success:
         logger.error("Cannot complete First Orion flow: push notification failed")
         return False, correlation_id
@@ -0,0 +1,70 @@
+# app/database/call_context_store.py
+"""
+Shared store for per-call contexts
+
+Contexts are written when a call is initiated and read by the WebSocket
+handler, which may run in a different worker. With REDIS_URL set they are
+kept in Redis so any worker can serve the call; otherwise an in-process
+dict is used (single-worker / local development).
+"""
+
+import logging
+import os
+from typing import Any, Dict, Optional
+
+import orjson
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.environ.get("REDIS_URL")
+# Contexts only need to live until Vonage opens the call WebSocket
+CONTEXT_TTL_SECONDS = 300
+
+
+class CallContextStore:
+    """
+    Call context store keyed by correlation_id (the call_id path param)
+    """
+
+    def __init__(self, redis_url: Optional[str] = REDIS_URL):
+        self._redis = None
+        self._local: Dict[str, Dict[str, Any]] = {}
+
+        if redis_url:
+            import redis.asyncio as redis
+
+            pool = redis.ConnectionPool.from_url(redis_url, max_connections=50)
+            self._redis = redis.Redis(connection_pool=pool)
+            logger.info("Call contexts stored in Redis")
+        else:
+            logger.info("REDIS_URL not set - call contexts stored in process memory")
+
+    @staticmethod
+    def _key(call_id: str) -> str:
+        return f"ctx:{call_id}"
+
+    async def set(self, call_id: str, context: Dict[str, Any]):
+        """Store context for a call"""
+        if self._redis:
+            await self._redis.set(self._key(call_id), orjson.dumps(context), ex=CONTEXT_TTL_SECONDS)
+        else:
+            self._local[call_id] = context
+
+    async def get(self, call_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch context for a call, or None if missing/expired"""
+        if self._redis:
+            raw = await self._redis.get(self._key(call_id))
+            return orjson.loads(raw) if raw else None
+        return self._local.get(call_id)
+
+    async def delete(self, call_id: str):
+        """Drop context once the call has ended"""
+        if self._redis:
+            await self._redis.delete(self._key(call_id))
+        else:
+            self._local.pop(call_id, None)
+
+
+call_contexts = CallContextStore()
@@ -294,7 +294,12 @@ class Database:
             logger.error(f"failed to fetch appointment by ID:  {str(e)}")
             return None
 
-    async def update_appointment(self, appointment_id: str, update_data: dict):
+    async def update_appointment(self, appointment_id: str, update_data: dict, expected_version=None):
+        '''
+        Update an appointment and bump its version counter.
+        :param expected_version: if given, only update when the stored version matches
+        :return: True if the document was updated
+        '''
         update_data['updatedAt'] = datetime.now(pytz.UTC)
 
         if 'appointmentDateTime' in update_data and 'duration' in update_data:
@@ -306,9 +311,14 @@ class Database:
                 update_data['endDateTime'] = update_data['appointmentDateTime'] + timedelta(
                     minutes=current_appointment['duration'])
 
+        query = {"_id": ObjectId(appointment_id)}
+        if expected_version is not None:
+            # Documents written before versioning have no 'version' field
+            query['version'] = expected_version if expected_version else {'$in': [0, None]}
+
         result = await self.db.appointments.update_one(
-            {"_id": ObjectId(appointment_id)},
-            {"$set": update_data}
+            query,
+            {"$set": update_data, "$inc": {"version": 1}}
         )
         return result.modified_count > 0
 
@@ -18,11 +18,11 @@ import uvicorn
 from typing import Optional, Dict, Any
 from dotenv import load_dotenv
 
-from vonage import Vonage, Auth
-
 # Import custom modules
-from app.webhooks.websocket_events import handle_voice_websocket, call_contexts
+from app.webhooks.websocket_events import handle_voice_websocket
+from app.database.call_context_store import call_contexts
 from app.services.appointment_agent import AppointmentAgent
+from app.services.deepgram_flux import deepgram_pool
 from app.services.voice import make_call
 from app.services.voice import get_webhook_url
 from app.telemetry.call_tracker import call_tracker
@@ -50,20 +50,6 @@ VCR_PORT = os.environ.get("VCR_PORT", "3000")
 
 logger.info(f"Starting application with webhook base URL: {WEBHOOK_BASE_URL}")
 
-# Initialize Vonage client with application-based authentication
-# VCR provides the private key as a string in VCR_PRIVATE_KEY
-if VONAGE_PRIVATE_KEY:
-    # If it's a file path, read it; otherwise use it directly as a string
-    if os.path.isfile(VONAGE_PRIVATE_KEY):
-        auth = Auth(application_id=VONAGE_APPLICATION_ID, private_key=VONAGE_PRIVATE_KEY)
-    else:
-        # VCR provides the key content directly
-        auth = Auth(application_id=VONAGE_APPLICATION_ID, private_key=VONAGE_PRIVATE_KEY)
-else:
-    raise ValueError("No private key found in environment variables")
-
-vonage = Vonage(auth)
-
 # Initialize FastAPI application
 app = FastAPI(
     title="Healthcare Voice Agent",
@@ -72,6 +58,17 @@ app = FastAPI(
 )
 
 
+@app.on_event("startup")
+async def startup():
+    """Pre-open Deepgram connections so calls skip the handshake"""
+    await deepgram_pool.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await deepgram_pool.close()
+
+
 
 
 # ============================================================================
@@ -85,7 +82,6 @@ async def setup_test_call(call_id: str, phone_number: str):
     For testing WebSocket + Deepgram integration
     """
     from app.services.appointment_agent import AppointmentAgent
-    from app.webhooks.websocket_events import call_contexts
 
     # Gather context
     context = await AppointmentAgent.get_call_context(phone_number)
@@ -97,14 +93,14 @@ async def setup_test_call(call_id: str, phone_number: str):
         }, status_code=404)
 
     # Store context
-    call_contexts[call_id] = context
+    await call_contexts.set(call_id, context)
 
     return JSONResponse(content={
         "status": "success",
         "message": f"Test call context created for {call_id}",
         "context": {
             "patient_name": context.get('patient_name'),
-            "appointments": len(context.get('appointments', []))
+            "appointments": context.get('appointment_count', 0)
         }
     })
 
@@ -161,10 +157,10 @@ async def inbound_sms(sms: InboundSMSEvent):
     correlation_id = call_tracker.start_auth_flow(from_number)
 
     # Store context for WebSocket handler
-    call_contexts[correlation_id] = context
+    await call_contexts.set(correlation_id, context)
 
     # Initiate the call
-    call_uuid = make_call(from_number, correlation_id)
+    call_uuid = await make_call(from_number, correlation_id)
 
     if call_uuid:
         return JSONResponse(
@@ -216,5 +212,7 @@ if __name__ == "__main__":
         app,
         host="0.0.0.0",
         port=port,
-        log_level="info"
+        log_level="info",
+        loop="uvloop",  # libuv event loop, lower wake latency for 20ms audio frames
+        http="httptools"
     )
\ No newline at end of file
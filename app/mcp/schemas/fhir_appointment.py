@@ -121,6 +121,7 @@ def appointment_to_fhir(appointment: Dict[str, Any]) -> Dict[str, Any]:
             }
         ],
         "meta": {
+            "versionId": str(appointment.get('version', 0)),
             "lastUpdated": appointment.get('updatedAt', datetime.now(UTC)).isoformat() if isinstance(
                 appointment.get('updatedAt'), datetime) else str(appointment.get('updatedAt', ''))
         }
@@ -159,7 +159,14 @@ async def get_appointment_by_id_tool(appointment_id: str) -> str:
         }, indent=2)
 
 
-async def update_appointment_tool(appointment_id: str, update_data: dict) -> str:
+def parse_if_match(if_match: str) -> int:
+    """
+    Parse an If-Match ETag (W/"<versionId>") into an integer version
+    """
+    return int(if_match.removeprefix('W/').strip('"'))
+
+
+async def update_appointment_tool(appointment_id: str, update_data: dict, if_match: Optional[str] = None) -> str:
     """
     Update an appointment
     Returns FHIR R4 Appointment resource
@@ -167,11 +174,15 @@ async def update_appointment_tool(appointment_id: str, update_data: dict) -> str
     Args:
         appointment_id: Appointment ID
         update_data: Fields to update (can include FHIR status)
+        if_match: Optional ETag (W/"<versionId>"); the update is rejected with a
+            'conflict' OperationOutcome if the stored version has changed
 
     Returns:
         JSON string of updated FHIR Appointment or OperationOutcome
     """
     try:
+        expected_version = parse_if_match(if_match) if if_match else None
+
         db = Database()
         await db.connect()
 
@@ -192,10 +203,19 @@ async def update_appointment_tool(appointment_id: str, update_data: dict) -> str
                 )
 
         # Update
-        success = await db.update_appointment(appointment_id, update_data)
+        success = await db.update_appointment(appointment_id, update_data, expected_version)
 
         if not success:
             await db.disconnect()
+            if expected_version is not None:
+                return json.dumps({
+                    "resourceType": "OperationOutcome",
+                    "issue": [{
+                        "severity": "error",
+                        "code": "conflict",
+                        "diagnostics": f"Version conflict updating appointment: {appointment_id}"
+                    }]
+                }, indent=2)
             return json.dumps({
                 "resourceType": "OperationOutcome",
                 "issue": [{
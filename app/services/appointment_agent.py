@@ -5,7 +5,7 @@ Appointment agent with FHIR function calling
 
 import json
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from datetime import datetime
 
 from app.mcp.tools.patient_tools import get_patient_by_phone_tool, get_patient_by_id_tool
@@ -17,6 +17,9 @@ from app.mcp.tools.appointment_tools import (
 
 logger = logging.getLogger(__name__)
 
+# Only the next couple of appointments are needed for the call prompt
+MAX_CONTEXT_APPOINTMENTS = 2
+
 
 class AppointmentAgent:
     """
@@ -124,31 +127,45 @@ Keep responses conversational and brief - this is a phone call."""
         ]
 
     @staticmethod
-    async def execute_function(function_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    async def execute_function(
+        function_name: str,
+        arguments: Dict[str, Any],
+        known_versions: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
         """
         Execute FHIR-like function calls
+
+        Args:
+            function_name: Function requested by the agent
+            arguments: Function arguments
+            known_versions: Appointment ID -> versionId the patient was told
+                about (see get_appointment_versions); updates are rejected if
+                the appointment has changed since. Updated in place after each
+                successful write, so pass the same dict for the whole call.
         """
+        if known_versions is None:
+            known_versions = {}
         logger.info(f"Executing function: {function_name} with args: {arguments}")
 
         try:
             if function_name == "confirm_appointment":
                 # Update status to 'booked' (FHIR) which maps to 'confirmed' (MongoDB)
-                result_json = await update_appointment_tool(
+                return await AppointmentAgent._update_if_unchanged(
                     appointment_id=arguments['appointment_id'],
-                    update_data={'status': 'booked'}  # FHIR status
+                    update_data={'status': 'booked'},  # FHIR status
+                    known_versions=known_versions
                 )
-                return json.loads(result_json)
 
             elif function_name == "cancel_appointment":
                 reason = arguments.get('reason', 'Patient requested cancellation via phone')
-                result_json = await update_appointment_tool(
+                return await AppointmentAgent._update_if_unchanged(
                     appointment_id=arguments['appointment_id'],
                     update_data={
                         'status': 'cancelled',  # FHIR status
                         'reason': reason
-                    }
+                    },
+                    known_versions=known_versions
                 )
-                return json.loads(result_json)
 
             elif function_name == "request_reschedule":
                 # Mark as pending and log request
@@ -182,6 +199,69 @@ Keep responses conversational and brief - this is a phone call."""
                 }]
             }
 
+    @staticmethod
+    async def _update_if_unchanged(
+        appointment_id: str,
+        update_data: Dict[str, Any],
+        known_versions: Dict[str, str]
+    ) -> Dict[str, Any]:
+        """
+        Update an appointment only if it is still at its known version (If-Match).
+        A conflict is returned to the agent rather than retried, so a change
+        made by the office during the call is never overwritten. On success the
+        new version is recorded in known_versions for later updates in the call.
+        """
+        version_id = known_versions.get(appointment_id)
+        if version_id is None:
+            # Not an appointment from this call's context: check its current state
+            current = json.loads(await get_appointment_by_id_tool(appointment_id))
+            if current.get('resourceType') == 'OperationOutcome':
+                return current
+            if current.get('status') == 'cancelled' and update_data.get('status') != 'cancelled':
+                return AppointmentAgent._conflict_outcome(appointment_id)
+            version_id = current.get('meta', {}).get('versionId', '0')
+
+        result = json.loads(await update_appointment_tool(
+            appointment_id=appointment_id,
+            update_data=update_data,
+            if_match=f'W/"{version_id}"'
+        ))
+
+        if result.get('resourceType') == 'OperationOutcome' and result['issue'][0]['code'] == 'conflict':
+            logger.warning(f"Appointment {appointment_id} changed since version {version_id}; update rejected")
+            return AppointmentAgent._conflict_outcome(appointment_id)
+
+        if result.get('resourceType') == 'Appointment':
+            # Every write bumps the version; track it so our own update isn't a conflict next time
+            known_versions[appointment_id] = result.get('meta', {}).get('versionId', version_id)
+        return result
+
+    @staticmethod
+    def _conflict_outcome(appointment_id: str) -> Dict[str, Any]:
+        """OperationOutcome telling the agent the appointment changed under it"""
+        return {
+            "resourceType": "OperationOutcome",
+            "issue": [{
+                "severity": "error",
+                "code": "conflict",
+                "diagnostics": (
+                    f"Appointment {appointment_id} was changed by the office during this call "
+                    "and was not updated. Do not tell the patient it was confirmed or cancelled; "
+                    "let them know the office will follow up."
+                )
+            }]
+        }
+
+    @staticmethod
+    def get_appointment_versions(context: Dict[str, Any]) -> Dict[str, str]:
+        """
+        Map each appointment in a call context to the versionId the patient is told about
+        """
+        return {
+            appointment['id']: appointment.get('meta', {}).get('versionId', '0')
+            for appointment in context.get('appointments', [])
+        }
+
     @staticmethod
     async def get_call_context(phone_number: str) -> Dict[str, Any]:
         """
@@ -218,13 +298,23 @@ Keep responses conversational and brief - this is a phone call."""
         # Build system prompt
         system_prompt = AppointmentAgent.build_system_prompt(full_name, appointments)
 
+        # Keep per-call context small; use get_full_patient() for the full resource
         return {
             'success': True,
             'phone_number': phone_number,
             'patient_id': patient_id,
             'patient_name': full_name,
-            'patient_resource': patient_resource,  # Full FHIR Patient
-            'appointments': appointments,  # List of FHIR Appointments
+            'patient_gender': patient_resource.get('gender'),
+            'appointments': appointments[:MAX_CONTEXT_APPOINTMENTS],  # Next FHIR Appointments
+            'appointment_count': len(appointments),
             'system_prompt': system_prompt,
             'functions': AppointmentAgent.get_function_definitions()
-        }
\ No newline at end of file
+        }
+
+    @staticmethod
+    async def get_full_patient(patient_id: str) -> Dict[str, Any]:
+        """
+        Fetch the full FHIR Patient resource on demand
+        """
+        patient_json = await get_patient_by_id_tool(patient_id)
+        return json.loads(patient_json)
@@ -5,19 +5,38 @@ Full conversational AI with STT + LLM + TTS built-in
 """
 
 import asyncio
-import json
 import logging
+import orjson
 import websockets
-from typing import Optional, Dict, Any, AsyncIterator, Callable, List
+from typing import Optional, Dict, Any, AsyncIterator, Callable, List, Set
 import os
 from dotenv import load_dotenv
 
-load_dotenv()
+# Skip re-reading .env when the key is already in the environment
+if "DEEPGRAM_PASSWORD" not in os.environ:
+    load_dotenv()
 logger = logging.getLogger(__name__)
 
 DEEPGRAM_API_KEY = os.environ.get("DEEPGRAM_PASSWORD")
 DEEPGRAM_AGENT_URL = "wss://agent.deepgram.com/v1/agent/converse"
 
+_FUNCTION_RESPONSE_PREFIX = b'{"type":"FunctionCallResponse","id":'
+
+# Pre-opened connections kept warm for new calls. Off by default: idle
+# connections are recycled every few seconds, around the clock.
+DEEPGRAM_POOL_SIZE = int(os.environ.get("DEEPGRAM_POOL_SIZE", "0"))
+# Idle connections older than this are replaced before Deepgram times them out
+DEEPGRAM_POOL_MAX_IDLE = float(os.environ.get("DEEPGRAM_POOL_MAX_IDLE", "8"))
+
+
+async def open_agent_connection() -> websockets.WebSocketClientProtocol:
+    """Open an authenticated WebSocket to the Deepgram Voice Agent API."""
+    headers = {"Authorization": f"Token {DEEPGRAM_API_KEY}"}
+    return await websockets.connect(
+        DEEPGRAM_AGENT_URL,
+        extra_headers=headers,
+    )
+
 
 class DeepgramVoiceAgent:
     """
@@ -53,6 +72,10 @@ class DeepgramVoiceAgent:
         self.llm_model = llm_model
         self.websocket: Optional[websockets.WebSocketClientProtocol] = None
         self.is_connected = False
+        # In-flight function call tasks, awaited on disconnect
+        self._function_tasks: Set[asyncio.Task] = set()
+        # Settings are fully known here, so serialize them once
+        self._config_message = orjson.dumps(self._build_config()).decode()
 
     # --------------------------------------------------------------------------
     # Connection Lifecycle
@@ -60,61 +83,21 @@ class DeepgramVoiceAgent:
 
 
 
-    async def connect(self):
-        """Establish WebSocket connection to Deepgram Voice Agent."""
+    async def connect(self, websocket: Optional[websockets.WebSocketClientProtocol] = None):
+        """
+        Establish WebSocket connection to Deepgram Voice Agent.
+
+        Args:
+            websocket: Optional pre-opened connection (see DeepgramConnectionPool);
+                a new connection is opened if not given.
+        """
         try:
-            headers = {"Authorization": f"Token {DEEPGRAM_API_KEY}"}
-            self.websocket = await websockets.connect(
-                DEEPGRAM_AGENT_URL,
-                extra_headers=headers,
-            )
+            self.websocket = websocket or await open_agent_connection()
             self.is_connected = True
             logger.info("Connected to Deepgram Voice Agent")
 
-            # app/services/deepgram_flux.py
-
-            config = {
-                "type": "Settings",
-                "audio": {
-                    "input": {
-                        "encoding": "linear16",
-                        "sample_rate": 16000
-                    },
-                    "output": {
-                        "encoding": "linear16",
-                        "sample_rate": 16000,
-                        "container": "none"
-                    }
-                },
-                "agent": {
-                    "listen": {
-                        "provider": {
-                            "type": "deepgram",
-                            "model": "nova-2"
-                        }
-                    },
-                    "think": {
-                        "provider": {
-                            "type": "anthropic",
-                            "model": self.llm_model
-                        },
-                        "prompt": self.system_prompt,
-                        "functions": self._format_functions()
-                    },
-                    "speak": {
-                        "provider": {
-                            "type": "deepgram",
-                            "model": self.voice_model
-                        }
-                    },
-                    "greeting": "Hello! This is your medical office calling."  #
-                }
-            }
-            if self.greeting:
-                config["agent"]["greeting"] = self.greeting
-
             logger.info(f"Sending config with {len(self.functions)} functions")
-            await self.websocket.send(json.dumps(config))
+            await self.websocket.send(self._config_message)
             logger.info(f"Voice Agent configured with LLM={self.llm_model}, Voice={self.voice_model}")
 
         except Exception as e:
@@ -123,12 +106,26 @@ class DeepgramVoiceAgent:
             raise
 
 
-    async def disconnect(self):
-        """Close WebSocket connection."""
-        if self.websocket:
-            await self.websocket.close()
-            self.is_connected = False
-            logger.info("Disconnected from Deepgram Voice Agent")
+    async def disconnect(self, function_timeout: Optional[float] = None):
+        """
+        Close WebSocket connection.
+
+        Args:
+            function_timeout: Max seconds to wait for pending function calls.
+                Calls still running after that are left to finish on their own
+                (not cancelled mid-write); the socket is closed regardless.
+        """
+        try:
+            if self._function_tasks:
+                logger.info(f"Waiting on {len(self._function_tasks)} pending function call(s)")
+                _, pending = await asyncio.wait(set(self._function_tasks), timeout=function_timeout)
+                if pending:
+                    logger.warning(f"{len(pending)} function call(s) still running at disconnect")
+        finally:
+            if self.websocket:
+                await self.websocket.close()
+                self.is_connected = False
+                logger.info("Disconnected from Deepgram Voice Agent")
 
     # --------------------------------------------------------------------------
     # Audio Streaming
@@ -170,8 +167,16 @@ class DeepgramVoiceAgent:
                     # Binary audio from Deepgram
                     yield {"type": "audio", "data": message}  # ← This is correct
                 else:
-                    # JSON messages
-                    parsed = json.loads(message)
+                    # JSON messages - Deepgram text frames are always objects
+                    if not message or message[0] != '{':
+                        logger.warning(f"Skipping non-JSON text frame from Voice Agent: {message[:50]!r}")
+                        continue
+                    parsed = orjson.loads(message)
+                    if parsed.get("type") == "FunctionCallRequest":
+                        # Run the handler in the background so audio keeps flowing
+                        task = asyncio.create_task(self._handle_function_call(parsed))
+                        self._function_tasks.add(task)
+                        task.add_done_callback(self._function_tasks.discard)
                     yield parsed  # ← This yields JSON events
 
         except Exception as e:
@@ -181,40 +186,55 @@ class DeepgramVoiceAgent:
     # --------------------------------------------------------------------------
 
     async def _handle_function_call(self, message: Dict[str, Any]):
-        """Handle an AgentV1FunctionCallRequest message."""
-        function_name = message.get("function_name")
-        function_id = message.get("function_call_id")
-        input_data = message.get("input", {})
-
-        logger.info(f"Function call requested: {function_name}")
-
-        try:
-            result = await self.function_handler(function_name, input_data)
-            await self.send_function_result(function_id, result)
-        except Exception as e:
-            logger.error(f"Error executing function '{function_name}': {str(e)}")
-            await self.send_function_result(function_id, {"error": str(e)})
-
-    async def send_function_result(self, function_call_id: str, result: Any):
         """
-        Send function execution result back to Deepgram.
+        Handle a v1 FunctionCallRequest message:
+        {"type": "FunctionCallRequest", "functions": [{"id", "name", "arguments", "client_side"}]}
+        """
+        for function in message.get("functions", []):
+            if not function.get("client_side", True):
+                # Server-side functions are executed by Deepgram
+                continue
+
+            function_name = function.get("name")
+            function_id = function.get("id")
+            logger.info(f"Function call requested: {function_name}")
+
+            try:
+                # arguments is a JSON-encoded string
+                arguments = function.get("arguments") or "{}"
+                input_data = orjson.loads(arguments) if isinstance(arguments, str) else arguments
+                result = await self.function_handler(function_name, input_data)
+                await self.send_function_result(function_id, function_name, result)
+            except Exception as e:
+                logger.error(f"Error executing function '{function_name}': {str(e)}")
+                await self.send_function_result(function_id, function_name, {"error": str(e)})
+
+    async def send_function_result(self, function_call_id: str, function_name: str, result: Any):
+        """
+        Send function execution result back to Deepgram as a v1 FunctionCallResponse.
 
         Args:
-            function_call_id: ID from the AgentV1FunctionCallRequest
-            result: Result payload to send back
+            function_call_id: id of the function from the FunctionCallRequest
+            function_name: name of the function that was called
+            result: Result payload; sent as a string in 'content'
         """
         if not self.is_connected or not self.websocket:
             logger.warning(" Cannot send function result - not connected")
             return
 
-        message = {
-            "type": "AgentV1SendFunctionCallResponse",
-            "function_call_id": function_call_id,
-            "output": result,
-        }
-
         try:
-            await self.websocket.send(json.dumps(message))
+            content = result if isinstance(result, str) else orjson.dumps(result).decode()
+            # Only the id, name and content vary, so splice them into a fixed template
+            message = (
+                _FUNCTION_RESPONSE_PREFIX
+                + orjson.dumps(function_call_id)
+                + b',"name":'
+                + orjson.dumps(function_name)
+                + b',"content":'
+                + orjson.dumps(content)
+                + b'}'
+            ).decode()
+            await self.websocket.send(message)
             logger.info(f"Sent function result for call {function_call_id}")
         except Exception as e:
             logger.error(f"Error sending function result: {str(e)}")
@@ -223,6 +243,49 @@ class DeepgramVoiceAgent:
     # Helper
     # --------------------------------------------------------------------------
 
+    def _build_config(self) -> Dict[str, Any]:
+        """Build the Settings message sent on connect"""
+        config = {
+            "type": "Settings",
+            "audio": {
+                "input": {
+                    "encoding": "linear16",
+                    "sample_rate": 16000
+                },
+                "output": {
+                    "encoding": "linear16",
+                    "sample_rate": 16000,
+                    "container": "none"
+                }
+            },
+            "agent": {
+                "listen": {
+                    "provider": {
+                        "type": "deepgram",
+                        "model": "nova-2"
+                    }
+                },
+                "think": {
+                    "provider": {
+                        "type": "anthropic",
+                        "model": self.llm_model
+                    },
+                    "prompt": self.system_prompt,
+                    "functions": self._format_functions()
+                },
+                "speak": {
+                    "provider": {
+                        "type": "deepgram",
+                        "model": self.voice_model
+                    }
+                },
+                "greeting": "Hello! This is your medical office calling."  #
+            }
+        }
+        if self.greeting:
+            config["agent"]["greeting"] = self.greeting
+        return config
+
     def _format_functions(self) -> List[Dict[str, Any]]:
         """Format functions for Deepgram Voice Agent API"""
         return [
@@ -233,3 +296,92 @@ class DeepgramVoiceAgent:
             }
             for f in self.functions
         ]
+
+
+class DeepgramConnectionPool:
+    """
+    Keeps a few pre-opened Deepgram Voice Agent connections so a new call
+    skips the TLS + WebSocket handshake. A connection carries a single
+    conversation, so it is consumed by the call rather than returned.
+    """
+
+    def __init__(self, size: int = DEEPGRAM_POOL_SIZE, max_idle: float = DEEPGRAM_POOL_MAX_IDLE):
+        self.size = size
+        self.max_idle = max_idle
+        self._idle: List[tuple] = []  # (websocket, opened_at)
+        self._wakeup = asyncio.Event()
+        self._maintainer: Optional[asyncio.Task] = None
+        # Stale connections being closed in the background
+        self._closing: Set[asyncio.Task] = set()
+
+    async def start(self):
+        """Start keeping the pool filled."""
+        if self.size and not self._maintainer:
+            self._maintainer = asyncio.create_task(self._maintain())
+            logger.info(f"Deepgram connection pool started (size={self.size})")
+
+    async def close(self):
+        """Stop refilling and close idle connections."""
+        if self._maintainer:
+            self._maintainer.cancel()
+            try:
+                await self._maintainer
+            except asyncio.CancelledError:
+                pass
+            self._maintainer = None
+        while self._idle:
+            websocket, _ = self._idle.pop()
+            self._close_later(websocket)
+        if self._closing:
+            await asyncio.gather(*self._closing, return_exceptions=True)
+
+    async def acquire(self) -> Optional[websockets.WebSocketClientProtocol]:
+        """
+        Take a warm connection, or None if none is ready (caller connects on demand).
+        """
+        now = asyncio.get_running_loop().time()
+        while self._idle:
+            websocket, opened_at = self._idle.pop()
+            if websocket.open and now - opened_at < self.max_idle:
+                self._wakeup.set()
+                return websocket
+            # Don't hold up call setup on the close handshake
+            self._close_later(websocket)
+        self._wakeup.set()
+        return None
+
+    def _close_later(self, websocket: websockets.WebSocketClientProtocol):
+        task = asyncio.create_task(websocket.close())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _maintain(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Keep the task alive through any failure, or the pool stays empty for good
+            try:
+                # Replace connections that are about to go stale
+                now = loop.time()
+                stale = [entry for entry in self._idle if not entry[0].open or now - entry[1] >= self.max_idle]
+                for entry in stale:
+                    self._idle.remove(entry)
+                    self._close_later(entry[0])
+
+                while len(self._idle) < self.size:
+                    try:
+                        websocket = await open_agent_connection()
+                    except Exception as e:
+                        logger.warning(f"Failed to pre-open Deepgram connection: {str(e)}")
+                        break
+                    self._idle.append((websocket, loop.time()))
+            except Exception as e:
+                logger.error(f"Deepgram pool maintenance failed: {str(e)}", exc_info=True)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.max_idle / 2)
+            except TimeoutError:
+                pass
+
+
+deepgram_pool = DeepgramConnectionPool()
@@ -0,0 +1,120 @@
+# app/services/pcm_chunker.py
+"""
+Re-chunks agent PCM audio into fixed-size frames and paces them out in real time
+"""
+
+import asyncio
+from typing import AsyncIterator, Optional, Union
+
+# Compact the pending buffer once this many frames have been consumed from its head
+_COMPACT_FRAMES = 50
+
+
+class PacedPcmChunker:
+    """
+    Buffers linear16 audio and yields one fixed-size frame per period.
+
+    Feed it arbitrary-sized audio with feed(); iterate it to get frames paced
+    against the event loop clock. Frames are copied into a single
+    preallocated buffer and yielded as a memoryview, so no object is
+    allocated per frame: a yielded frame is only valid until the next
+    iteration. At most max_buffer_bytes of audio is held; beyond that the
+    oldest frames are dropped and counted in dropped_frames. On underrun
+    the iterator yields the `underrun` value (None by default, or e.g. a
+    silence frame to keep the stream continuously fed).
+    """
+
+    def __init__(
+        self,
+        chunk_bytes: int = 640,
+        period_s: float = 0.02,
+        max_lag_s: float = 0.2,
+        underrun: Optional[bytes] = None,
+        max_buffer_bytes: int = 1920000,
+    ):
+        """
+        Args:
+            chunk_bytes: Frame size (640 = 20ms of 16kHz linear16).
+            period_s: Time between frames.
+            max_lag_s: How far pacing may fall behind before resyncing.
+            underrun: Value yielded on ticks with no audio queued.
+            max_buffer_bytes: Cap on queued audio (1920000 = 60s of 16kHz linear16).
+                Agent TTS arrives faster than real time, so whole utterances
+                queue up; this only guards against unbounded growth.
+        """
+        self.chunk_bytes = chunk_bytes
+        self.period_s = period_s
+        self.max_lag_s = max_lag_s
+        self.underrun = underrun
+        self.max_buffer_bytes = max_buffer_bytes
+        self.dropped_frames = 0
+        self._pending = bytearray()
+        self._pos = 0  # read offset into _pending
+        self._out = memoryview(bytearray(chunk_bytes))
+
+    def __len__(self) -> int:
+        """Number of complete frames queued"""
+        return (len(self._pending) - self._pos) // self.chunk_bytes
+
+    def feed(self, audio: bytes):
+        """Append audio to the pending buffer, dropping the oldest frames past the cap"""
+        self._pending.extend(audio)
+
+        queued = len(self._pending) - self._pos
+        excess = queued - self.max_buffer_bytes
+        if excess > 0:
+            size = self.chunk_bytes
+            drop = min(-(-excess // size) * size, queued)
+            self._pos += drop
+            self.dropped_frames += drop // size
+            if self._pos >= _COMPACT_FRAMES * size:
+                del self._pending[:self._pos]
+                self._pos = 0
+
+    def flush(self):
+        """Pad a trailing partial frame with silence so it is sent (e.g. at the end of an utterance)"""
+        partial = (len(self._pending) - self._pos) % self.chunk_bytes
+        if partial:
+            self._pending.extend(bytes(self.chunk_bytes - partial))
+
+    def clear(self):
+        """Drop all queued audio (barge-in)"""
+        self._pending.clear()
+        self._pos = 0
+
+    def _next_frame(self) -> Optional[memoryview]:
+        size = self.chunk_bytes
+        pos = self._pos
+        if len(self._pending) - pos < size:
+            return None
+
+        with memoryview(self._pending) as pending:
+            self._out[:] = pending[pos:pos + size]
+        pos += size
+
+        # Drop consumed audio in batches rather than shifting the buffer every frame
+        if pos == len(self._pending) or pos >= _COMPACT_FRAMES * size:
+            del self._pending[:pos]
+            pos = 0
+        self._pos = pos
+        return self._out
+
+    def __aiter__(self) -> AsyncIterator[Union[memoryview, bytes, None]]:
+        return self._paced()
+
+    async def _paced(self) -> AsyncIterator[Union[memoryview, bytes, None]]:
+        loop = asyncio.get_running_loop()
+        next_deadline = loop.time()
+
+        while True:
+            # Sleep to an absolute deadline so scheduling jitter doesn't accumulate
+            next_deadline += self.period_s
+            delay = next_deadline - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif delay < -self.max_lag_s:
+                # Fell too far behind; resync rather than bursting
+                next_deadline = loop.time()
+
+            frame = self._next_frame()
+            yield self.underrun if frame is None else frame
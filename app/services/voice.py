@@ -4,7 +4,10 @@ Vonage Voice API service
 Handles outbound call initiation
 """
 
+import asyncio
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 from vonage import Vonage, Auth
 from vonage_voice import CreateCallRequest, Phone, ToPhone
@@ -15,7 +18,7 @@ load_dotenv()
 
 
 
-from app.branded_calling.first_orion import get_auth_token, send_push_notification
+from app.branded_calling.first_orion import get_cached_auth_token, send_push_notification
 from app.telemetry.call_tracker import call_tracker
 
 logger = logging.getLogger(__name__)
@@ -26,36 +29,101 @@ VONAGE_PRIVATE_KEY = os.environ.get("VONAGE_APPLICATION_PRIVATE_KEY")
 VONAGE_NUMBER = os.environ.get("VONAGE_NUMBER")
 logger.info(f"Loaded Vonage Number {VONAGE_NUMBER}")
 WEBHOOK_BASE_URL = os.environ.get("VCR_INSTANCE_PUBLIC_URL") or os.environ.get("WEBHOOK_BASE_URL")
+# First Orion expects the push before the call; set to overlap the push with
+# call creation, trading a round trip for a chance the call arrives unbranded
+FIRST_ORION_OVERLAP_PUSH = os.environ.get("FIRST_ORION_OVERLAP_PUSH", "false").lower() == "true"
 
 
-# Initialize Vonage client
+# Reuse a signed application JWT for this long (the SDK issues 15-minute tokens)
+JWT_CACHE_SECONDS = 600
+
+
+class CachedJwtAuth(Auth):
+    """
+    Vonage Auth that reuses the signed application JWT instead of
+    RSA-signing a new one for every API request
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cached_jwt = None
+        self._cached_jwt_expires = 0.0
+
+    def generate_application_jwt(self, *args, **kwargs):
+        if args or kwargs:
+            # Custom claims are never cached
+            return super().generate_application_jwt(*args, **kwargs)
+
+        now = time.monotonic()
+        if self._cached_jwt is None or now >= self._cached_jwt_expires:
+            self._cached_jwt = super().generate_application_jwt()
+            self._cached_jwt_expires = now + JWT_CACHE_SECONDS
+        return self._cached_jwt
+
+
+# Initialize Vonage client once; the key may be a file path or the key content (VCR)
 if VONAGE_PRIVATE_KEY:
     if os.path.isfile(VONAGE_PRIVATE_KEY):
-        auth = Auth(application_id=VONAGE_APPLICATION_ID, private_key=VONAGE_PRIVATE_KEY)
+        with open(VONAGE_PRIVATE_KEY) as key_file:
+            private_key = key_file.read()
     else:
-        auth = Auth(application_id=VONAGE_APPLICATION_ID, private_key=VONAGE_PRIVATE_KEY)
+        private_key = VONAGE_PRIVATE_KEY
+    auth = CachedJwtAuth(application_id=VONAGE_APPLICATION_ID, private_key=private_key)
 else:
     raise ValueError("No private key found in environment variables")
 
 vonage = Vonage(auth)
 
+# Bounded pool for the synchronous Vonage SDK so call bursts can't block the event loop
+_vonage_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='vonage')
+
 
 # app/services/voice.py
 
+# Base URLs never change at runtime, so resolve them once
+_HTTP_BASE = (WEBHOOK_BASE_URL or '').rstrip('/')
+# For WebSocket endpoints, convert https:// to wss://
+_WS_BASE = _HTTP_BASE.replace('https://', 'wss://').replace('http://', 'ws://')
+_EVENT_URL = f"{_HTTP_BASE}/webhooks/voice/event"
+
+# Static parts of the NCCO; only the WebSocket uri varies per call
+_NCCO_ENDPOINT = {
+    "type": "websocket",
+    "content-type": "audio/l16;rate=16000",
+    'headers': {
+        'source': 'flux'
+    }
+}
+_NCCO_CONNECT = {
+    "action": "connect",
+    "from_": VONAGE_NUMBER,
+}
+
+
 def get_webhook_url(endpoint: str) -> str:
     """Construct full webhook URL"""
-    base_url = WEBHOOK_BASE_URL.rstrip('/')
     endpoint = endpoint.lstrip('/')  # Strip leading slash
-
-    # For WebSocket endpoints, convert https:// to wss://
-    if endpoint.startswith('ws/'):
-        base_url = base_url.replace('https://', 'wss://').replace('http://', 'ws://')
+    base_url = _WS_BASE if endpoint.startswith('ws/') else _HTTP_BASE
 
     full_url = f"{base_url}/{endpoint}"
     logger.debug(f"Webhook URL: {full_url}")
     return full_url
 
-def make_call(to_number: str, correlation_id: str) -> Optional[str]:
+async def _await_push(push, to_number: str):
+    """Wait for the First Orion push; a failure only means the call goes unbranded"""
+    try:
+        success, push_data = await push
+    except Exception as e:
+        logger.error(f"First Orion push notification failed: {str(e)}")
+        success = False
+
+    if success:
+        logger.info(f"Successfully sent First Orion push notification for {to_number}")
+    else:
+        logger.warning(f"Failed to send First Orion push notification. Call will proceed unbranded.")
+
+
+async def make_call(to_number: str, correlation_id: str) -> Optional[str]:
     """
     Initiate branded outbound call with WebSocket connection to Deepgram Flux
 
@@ -69,53 +137,49 @@ def make_call(to_number: str, correlation_id: str) -> Optional[str]:
     logger.info(f"Initiating call to {to_number} with correlation_id {correlation_id}")
 
 
-    # First Orion branded calling
-    token, auth_data = get_auth_token(correlation_id)
+    # First Orion branded calling - push before the call unless overlap is enabled
+    push_task = None
+    token, auth_data = await get_cached_auth_token(correlation_id)
     if token:
         logger.info(f"Successfully obtained First Orion auth token")
-        success, push_data = send_push_notification(
+        push = send_push_notification(
             correlation_id,
             token,
             VONAGE_NUMBER,
             to_number
         )
-        if success:
-            logger.info(f"Successfully sent First Orion push notification for {to_number}")
+        if FIRST_ORION_OVERLAP_PUSH:
+            push_task = asyncio.create_task(push)
         else:
-            logger.warning(f"Failed to send First Orion push notification. Call will proceed unbranded.")
+            await _await_push(push, to_number)
     else:
         logger.warning(f"Failed to get First Orion auth token. Call will proceed unbranded.")
 
     # Create the call with WebSocket connection to Flux AI
     try:
-        ncco = [
-            {
-                "action": "connect",
-                "from_": VONAGE_NUMBER,
-                "endpoint": [
-                    {
-                        "type": "websocket",
-                        "uri": get_webhook_url(f'ws/voice/{correlation_id}'),
-                        "content-type": "audio/l16;rate=16000",
-                        'headers': {
-                            'source': 'flux'
-                        }
-
-                    }
-                ]
-            }
-        ]
+        ncco = [{
+            **_NCCO_CONNECT,
+            "endpoint": [{**_NCCO_ENDPOINT, "uri": f"{_WS_BASE}/ws/voice/{correlation_id}"}]
+        }]
 
         call_request = CreateCallRequest(
             ncco=ncco,
             to=[ToPhone(number=to_number)],  # Use ToPhone class
             from_=Phone(number=VONAGE_NUMBER),  # Use Phone class
             ringing_timer=60,
-            event_url=[get_webhook_url('webhooks/voice/event')],
+            event_url=[_EVENT_URL],
             event_method='POST'
         )
 
-        response = vonage.voice.create_call(call_request)
+        # The Vonage SDK is synchronous, so run it in a worker thread
+        loop = asyncio.get_running_loop()
+        call_future = loop.run_in_executor(_vonage_executor, vonage.voice.create_call, call_request)
+
+        if push_task:
+            # Never raises, so the placed call is always awaited and recorded
+            await _await_push(push_task, to_number)
+
+        response = await call_future
         logger.info(f"Call created successfully: {response.uuid}")
 
         call_tracker.record_vonage_call(correlation_id, response)
@@ -124,4 +188,4 @@ def make_call(to_number: str, correlation_id: str) -> Optional[str]:
 
     except (AuthenticationError, HttpRequestError) as e:
         logger.error(f'Error when calling {to_number}: {str(e)}')
-        return None
\ No newline at end of file
+        return None
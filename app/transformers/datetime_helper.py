@@ -1,19 +1,43 @@
 from datetime import datetime
+from functools import lru_cache
+from typing import Iterable, List
+
+
+# Ordinal suffix indexed directly by day of month (index 0 unused)
+_SUFFIX = (
+    "", "st", "nd", "rd", "th", "th", "th", "th", "th", "th", "th",
+    "th", "th", "th", "th", "th", "th", "th", "th", "th", "th",
+    "st", "nd", "rd", "th", "th", "th", "th", "th", "th", "th", "st",
+)
+
+# Month names and ordinal days, indexed by dt.month - 1 and dt.day - 1
+_MONTHS = (
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December",
+)
+_DAY_ORD = tuple(f"{day}{_SUFFIX[day]}" for day in range(1, 32))
+
+# 12-hour clock hour and meridiem, indexed by dt.hour
+_HOUR12 = tuple(hour % 12 or 12 for hour in range(24))
+_MERIDIEM = ("AM",) * 12 + ("PM",) * 12
 
 
 def format_datetime_for_tts(dt: datetime) -> str:
-    # Format the date
-    date_str = dt.strftime("%B %d, %Y")
+    # Key the cache on wall-clock fields: aware datetimes for the same instant
+    # in different offsets hash equal but must render differently
+    return _format_minute(dt.year, dt.month, dt.day, dt.hour, dt.minute)
+
 
-    # Add the ordinal indicator to the day
-    day = dt.day
-    if 4 <= day <= 20 or 24 <= day <= 30:
-        suffix = "th"
-    else:
-        suffix = ["st", "nd", "rd"][day % 10 - 1]
-    date_str = date_str.replace(f" {day},", f" {day}{suffix},")
+@lru_cache(maxsize=1024)
+def _format_minute(year: int, month: int, day: int, hour: int, minute: int) -> str:
+    # Assemble date and time in one pass, e.g. "March 5th, 2025 at 9:05 AM"
+    return (
+        f"{_MONTHS[month - 1]} {_DAY_ORD[day - 1]}, {year} "
+        f"at {_HOUR12[hour]}:{minute:02d} {_MERIDIEM[hour]}"
+    )
 
-    # Format the time
-    time_str = dt.strftime("%I:%M %p").lstrip("0")
 
-    return f"{date_str} at {time_str}"
\ No newline at end of file
+def format_datetimes_for_tts(dts: Iterable[datetime]) -> List[str]:
+    # Batch form for lists of slots, e.g. "here are 5 available times"
+    fmt = _format_minute
+    return [fmt(dt.year, dt.month, dt.day, dt.hour, dt.minute) for dt in dts]
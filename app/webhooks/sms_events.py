@@ -10,6 +10,8 @@ import logging
 from app.models.events.sms_events import InboundSMSEvent
 from app.services.appointment_agent import AppointmentAgent
 from app.services.voice import make_call
+from app.database.call_context_store import call_contexts
+from app.telemetry.call_tracker import call_tracker
 
 logger = logging.getLogger(__name__)
 
@@ -34,14 +36,14 @@ async def handle_inbound_sms(sms: InboundSMSEvent) -> JSONResponse:
             "message": context.get('error', 'Failed to gather patient info')
         }, status_code=404)
 
-    # Store context for the call (you'll need this in WebSocket handler)
-    # Could use Redis, in-memory cache, or pass via call metadata
-    call_context_cache[from_number] = context
+    # Store context for the WebSocket handler, keyed by the call's correlation ID
+    correlation_id = call_tracker.start_auth_flow(from_number)
+    await call_contexts.set(correlation_id, context)
 
-    # Initiate call with context
-    call_uuid = make_call(
+    # Initiate call
+    call_uuid = await make_call(
         to_number=from_number,
-        context=context
+        correlation_id=correlation_id
     )
 
     if call_uuid:
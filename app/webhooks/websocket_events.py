@@ -4,19 +4,103 @@ WebSocket handler - bridges Vonage Voice and Deepgram Voice Agent
 """
 
 import asyncio
-import json
 import logging
-import base64
+import os
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Dict
+import orjson
+import pybase64
 from fastapi import WebSocket, WebSocketDisconnect
 
-from app.services.deepgram_flux import DeepgramVoiceAgent
+from app.services.deepgram_flux import DeepgramVoiceAgent, deepgram_pool
 from app.services.appointment_agent import AppointmentAgent
+from app.services.pcm_chunker import PacedPcmChunker
+from app.database.call_context_store import call_contexts
 
 logger = logging.getLogger(__name__)
 
-# In-memory cache for call contexts
-call_contexts = {}
+# Caller audio is coalesced into batches of this many ms before sending to
+# Deepgram (0 disables batching, e.g. for tight barge-in latency targets)
+AUDIO_BATCH_MS = int(os.environ.get("DEEPGRAM_AUDIO_BATCH_MS", "40"))
+AUDIO_BATCH_BYTES = AUDIO_BATCH_MS * 32  # 16kHz linear16 = 32 bytes/ms
+AUDIO_BATCH_SECONDS = AUDIO_BATCH_MS / 1000
 
+# Markers for the compact Vonage media frame {"event":"media","media":{"payload":"..."}}
+_MEDIA_EVENT = '"event":"media"'
+_PAYLOAD_KEY = '"payload":"'
+
+# Seconds to wait for in-flight function calls before closing Deepgram on teardown
+DEEPGRAM_CLOSE_TIMEOUT = 5
+
+# Greeting trigger sent once Deepgram applies settings
+_INJECT_GREETING = orjson.dumps({"type": "InjectUserMessage", "content": "hello"}).decode()
+
+
+@dataclass
+class DeepgramStreamState:
+    """Per-call state shared by the Deepgram message handlers"""
+    agent: DeepgramVoiceAgent
+    chunker: PacedPcmChunker
+    settings_applied: bool = False
+
+
+async def _on_audio(message: Dict[str, Any], state: DeepgramStreamState):
+    audio_data = message.get('data')
+    if audio_data:
+        state.chunker.feed(audio_data)
+
+
+async def _on_settings_applied(message: Dict[str, Any], state: DeepgramStreamState):
+    logger.info("Deepgram event: SettingsApplied")
+    if not state.settings_applied:
+        state.settings_applied = True
+        logger.info("Settings applied, sending initial greeting trigger")
+        await state.agent.websocket.send(_INJECT_GREETING)
+
+
+async def _on_agent_audio_done(message: Dict[str, Any], state: DeepgramStreamState):
+    # Flush the trailing partial frame of the utterance
+    logger.info("Deepgram event: AgentAudioDone")
+    state.chunker.flush()
+
+
+async def _on_user_started_speaking(message: Dict[str, Any], state: DeepgramStreamState):
+    # Barge-in: clear buffer
+    logger.info("User started speaking - clearing audio buffer")
+    state.chunker.clear()
+
+
+async def _on_ignored_event(message: Dict[str, Any], state: DeepgramStreamState):
+    pass
+
+
+async def _on_other_event(message: Dict[str, Any], state: DeepgramStreamState):
+    msg_type = message.get('type')
+    logger.info(f"Deepgram event: {msg_type}")
+    if msg_type == 'Error':
+        logger.error(f"Deepgram error: {message}")
+
+
+# Deepgram message type -> handler, built once instead of an if/elif chain per message
+_DG_HANDLERS = {
+    'audio': _on_audio,
+    'SettingsApplied': _on_settings_applied,
+    'AgentAudioDone': _on_agent_audio_done,
+    'UserStartedSpeaking': _on_user_started_speaking,
+    'History': _on_ignored_event,
+    'ConversationText': _on_ignored_event,
+}
+
+
+class CallEnded(Exception):
+    """Raised when one side of the call stream ends, to stop the other tasks"""
+
+
+async def _ends_call(stream_loop):
+    """Run a stream loop; once it returns, end the call so sibling tasks are cancelled"""
+    await stream_loop
+    raise CallEnded
 
 
 async def handle_voice_websocket(websocket: WebSocket, call_id: str):
@@ -26,7 +110,7 @@ async def handle_voice_websocket(websocket: WebSocket, call_id: str):
     await websocket.accept()
     logger.info(f"WebSocket connected for call {call_id}")
 
-    context = call_contexts.get(call_id)
+    context = await call_contexts.get(call_id)
     if not context or not context.get('success'):
         logger.error(f"No valid context found for call {call_id}")
         await websocket.close(code=1008, reason="No call context")
@@ -34,21 +118,33 @@ async def handle_voice_websocket(websocket: WebSocket, call_id: str):
 
     logger.info(f"Context for {call_id}:")
     logger.info(f"  Patient: {context.get('patient_name')}")
-    logger.info(f"  Appointments: {len(context.get('appointments', []))}")
+    logger.info(f"  Appointments: {context.get('appointment_count', 0)}")
     logger.info(f"  Greeting: {context.get('greeting', 'None')}")
 
     # Initialize Deepgram Voice Agent
     agent = DeepgramVoiceAgent(
         system_prompt=context['system_prompt'],
         functions=context['functions'],
-        function_handler=AppointmentAgent.execute_function,
+        # Updates are guarded by the appointment versions the patient is told about
+        function_handler=partial(
+            AppointmentAgent.execute_function,
+            known_versions=AppointmentAgent.get_appointment_versions(context)
+        ),
         greeting=context.get('greeting'),
         voice_model="aura-2-thalia-en",
         llm_model="claude-sonnet-4-20250514"
     )
 
     try:
-        await agent.connect()
+        pooled = await deepgram_pool.acquire()
+        try:
+            await agent.connect(pooled)
+        except Exception:
+            if pooled is None:
+                raise
+            # The warm connection may have dropped since it was checked
+            logger.warning(f"Pooled Deepgram connection failed for call {call_id}, opening a new one")
+            await agent.connect()
         logger.info(f"Deepgram Voice Agent connected for call {call_id}")
     except Exception as e:
         logger.error(f"Failed to connect to Deepgram: {e}")
@@ -57,52 +153,90 @@ async def handle_voice_websocket(websocket: WebSocket, call_id: str):
 
     call_active = True
 
-    # Audio buffer for pacing output to Vonage
-    audio_buffer = bytearray()
-    buffer_index = 0
+    # Agent audio re-chunked into 20ms frames and paced out to Vonage
+    chunker = PacedPcmChunker()
 
     async def vonage_to_deepgram():
         """Forward audio from Vonage to Deepgram"""
         nonlocal call_active
         logger.info(f"Starting vonage_to_deepgram loop for {call_id}")
 
+        loop = asyncio.get_running_loop()
+        # JSON-wrapped media frames seen; should stay 0 with binary L16 configured
+        text_media_frames = 0
+        send_buf = bytearray()
+        last_flush = loop.time()
+
+        def count_text_media():
+            nonlocal text_media_frames
+            if not text_media_frames:
+                logger.warning(f"Vonage is sending JSON media frames for {call_id}; expected binary L16")
+            text_media_frames += 1
+
+        async def flush_audio():
+            nonlocal last_flush
+            if send_buf:
+                await agent.send_audio(bytes(send_buf))
+                send_buf.clear()
+            last_flush = loop.time()
+
+        async def forward_audio(audio_bytes: bytes):
+            if not AUDIO_BATCH_BYTES:
+                await agent.send_audio(audio_bytes)
+                return
+            send_buf.extend(audio_bytes)
+            if len(send_buf) >= AUDIO_BATCH_BYTES or loop.time() - last_flush >= AUDIO_BATCH_SECONDS:
+                await flush_audio()
+
         try:
             while call_active:
                 try:
                     message = await websocket.receive()
 
-                    if "text" in message:
-                        data = json.loads(message["text"])
+                    # Fast path: raw L16 binary frames need no parsing or decoding
+                    audio_bytes = message.get("bytes")
+                    if audio_bytes:
+                        await forward_audio(audio_bytes)
+
+                    elif text := message.get("text"):
+                        if _MEDIA_EVENT in text:
+                            # Fixed-shape media frame: slice the payload out without building a dict
+                            count_text_media()
+                            audio_b64 = text.partition(_PAYLOAD_KEY)[2].partition('"')[0]
+                            if audio_b64:
+                                audio_bytes = pybase64.b64decode(audio_b64, validate=False)
+                                await forward_audio(audio_bytes)
+                            continue
+
+                        data = orjson.loads(text)
                         event = data.get('event')
 
                         if event == 'media':
+                            count_text_media()
                             audio_b64 = data.get('media', {}).get('payload', '')
                             if audio_b64:
-                                audio_bytes = base64.b64decode(audio_b64)
-                                await agent.send_audio(audio_bytes)
+                                audio_bytes = pybase64.b64decode(audio_b64, validate=False)
+                                await forward_audio(audio_bytes)
 
                         elif event == 'start':
                             logger.info(f"Call started: {call_id}")
 
                         elif event == 'stop':
                             logger.info(f"Call stopped: {call_id}")
+                            await flush_audio()
                             call_active = False
                             break
 
                         elif event == 'websocket:connected':
                             logger.info("Vonage WebSocket connected")
 
-                    elif "bytes" in message:
-                        audio_bytes = message["bytes"]
-                        await agent.send_audio(audio_bytes)
-
                 except RuntimeError as e:
                     if "disconnect message has been received" in str(e):
                         logger.info("Vonage disconnected")
                         call_active = False
                         break
                     raise
-                except json.JSONDecodeError as e:
+                except orjson.JSONDecodeError as e:
                     logger.error(f"JSON decode error: {e}")
                 except Exception as e:
                     logger.error(f"Error processing message: {e}")
@@ -111,44 +245,22 @@ async def handle_voice_websocket(websocket: WebSocket, call_id: str):
             logger.error(f"Error in vonage_to_deepgram: {e}")
             call_active = False
 
+        if text_media_frames:
+            logger.warning(f"Received {text_media_frames} JSON media frames from Vonage for {call_id}")
         logger.info(f"vonage_to_deepgram ended")
 
     async def deepgram_to_vonage():
         """Forward audio from Deepgram to Vonage with buffering"""
-        nonlocal call_active, audio_buffer
+        nonlocal call_active
         logger.info(f"Starting deepgram_to_vonage loop for {call_id}")
-        settings_applied = False
+        state = DeepgramStreamState(agent=agent, chunker=chunker)
 
         try:
             async for message in agent.receive_messages():
                 if not call_active:
                     break
 
-                msg_type = message.get('type')
-
-                if msg_type == 'SettingsApplied' and not settings_applied:
-                    settings_applied = True
-                    logger.info("Settings applied, sending initial greeting trigger")
-                    await agent.websocket.send(json.dumps({
-                        "type": "InjectUserMessage",
-                        "content": "hello"
-                    }))
-
-                if msg_type == 'audio':
-                    # Buffer audio from Deepgram
-                    audio_data = message.get('data')
-                    if audio_data:
-                        audio_buffer.extend(audio_data)
-
-                elif msg_type == 'UserStartedSpeaking':
-                    # Barge-in: clear buffer
-                    logger.info("User started speaking - clearing audio buffer")
-                    audio_buffer.clear()
-
-                elif msg_type not in ['History', 'ConversationText']:
-                    logger.info(f"Deepgram event: {msg_type}")
-                    if msg_type == 'Error':
-                        logger.error(f"Deepgram error: {message}")
+                await _DG_HANDLERS.get(message.get('type'), _on_other_event)(message, state)
 
         except Exception as e:
             logger.error(f"Error in deepgram_to_vonage: {e}", exc_info=True)
@@ -158,24 +270,15 @@ async def handle_voice_websocket(websocket: WebSocket, call_id: str):
 
     async def stream_to_vonage():
         """Send buffered audio to Vonage at steady rate"""
-        nonlocal call_active, audio_buffer, buffer_index
+        nonlocal call_active
         logger.info("Starting stream_to_vonage timer")
 
         try:
-            while call_active:
-                await asyncio.sleep(0.02)  # 20ms timer
-
-                if len(audio_buffer) > buffer_index:
-                    # Send 640-byte chunk (20ms of 16kHz linear16 audio)
-                    chunk = bytes(audio_buffer[buffer_index:buffer_index + 640])
-
-                    if len(chunk) > 0:
-                        await websocket.send_bytes(chunk)
-                        buffer_index += 640
-
-                    # Prevent index from growing forever
-                    if buffer_index > len(audio_buffer):
-                        buffer_index = len(audio_buffer)
+            async for chunk in chunker:
+                if not call_active:
+                    break
+                if chunk:
+                    await websocket.send_bytes(chunk)
 
         except Exception as e:
             logger.error(f"Error in stream_to_vonage: {e}")
@@ -183,15 +286,26 @@ async def handle_voice_websocket(websocket: WebSocket, call_id: str):
 
         logger.info("stream_to_vonage ended")
 
-    # Run all three tasks concurrently
+    # Run all three tasks concurrently; the first to finish or fail cancels the rest
     try:
         logger.info(f"Starting audio bidirectional streaming for {call_id}")
-        await asyncio.gather(
-            vonage_to_deepgram(),
-            deepgram_to_vonage(),
-            stream_to_vonage()  # NEW: Timer-based sender
-        )
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(_ends_call(vonage_to_deepgram()))
+            tg.create_task(_ends_call(deepgram_to_vonage()))
+            tg.create_task(_ends_call(stream_to_vonage()))  # Timer-based sender
+    except* CallEnded:
+        pass
+    except* Exception as eg:
+        for exc in eg.exceptions:
+            logger.error(f"Streaming task failed for call {call_id}: {exc}", exc_info=exc)
     finally:
         logger.info(f"Cleaning up call {call_id}")
-        await agent.disconnect()
+        if chunker.dropped_frames:
+            logger.warning(f"dropped_audio_frames_total={chunker.dropped_frames} for call {call_id}")
+        chunker.clear()
+        try:
+            await agent.disconnect(function_timeout=DEEPGRAM_CLOSE_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Error closing Deepgram connection for call {call_id}: {e}")
+        await call_contexts.delete(call_id)
         logger.info(f"WebSocket closed for call {call_id}")
\ No newline at end of file
@@ -1,13 +1,23 @@
 import os
+import sys
 
-def print_directory_structure(path, indent=""):
-    items = sorted(os.listdir(path))
-    for item in items:
-        if item.startswith('.'):
+def collect_directory_structure(path, indent="", lines=None):
+    if lines is None:
+        lines = []
+    # scandir returns cached entry types, avoiding a stat() per entry
+    with os.scandir(path) as it:
+        entries = sorted(it, key=lambda e: e.name)
+    for entry in entries:
+        if entry.name.startswith('.'):
             continue  # Skip hidden files
-        item_path = os.path.join(path, item)
-        print(f"{indent}{item}")
-        if os.path.isdir(item_path):
-            print_directory_structure(item_path, indent + "  ")
+        lines.append(f"{indent}{entry.name}")
+        if entry.is_dir(follow_symlinks=False):
+            collect_directory_structure(entry.path, indent + "  ", lines)
+    return lines
+
+def print_directory_structure(path, indent=""):
+    lines = collect_directory_structure(path, indent)
+    if lines:
+        sys.stdout.write("\n".join(lines) + "\n")
 
-print_directory_structure(".")
\ No newline at end of file
+print_directory_structure(".")
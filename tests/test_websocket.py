@@ -1,51 +1,134 @@
 # test_websocket.py - updated with more logging
 
 import asyncio
+import logging
+import logging.handlers
+import queue
+import uvloop
 import websockets
-import json
+import orjson
 
+log = logging.getLogger(__name__)
+
+CALL_ID = "test_call_12345"
+URI = f"ws://localhost:3000/ws/voice/{CALL_ID}"
+RECEIVE_TIMEOUT_S = 10
+
+_EVENT_OPTS = orjson.OPT_NAIVE_UTC | orjson.OPT_OMIT_MICROSECONDS
+
+
+def encode_event(event):
+    """
+    Serialize an outbound Vonage-style event with orjson.
+    Returned as str so it goes out as a text frame; the server treats
+    binary frames as audio.
+    """
+    return orjson.dumps(event, option=_EVENT_OPTS).decode()
+
+
+# Simulated Vonage "start" event, serialized once
+_START_EVENT = encode_event({"event": "start", "start": {"streamSid": "test-stream-123"}})
+
+_MEDIA_PREFIX = '{"event":"media"'
+_MEDIA_PREFIX_BYTES = _MEDIA_PREFIX.encode()
+
+
+def peek_event(message):
+    """Return a frame's event type, parsing it only when the prefix doesn't tell"""
+    if isinstance(message, bytes):
+        if message.startswith(_MEDIA_PREFIX_BYTES):
+            return 'media'
+        if not message.startswith(b'{'):
+            return 'audio'  # raw L16 frame from the agent
+        try:
+            return orjson.loads(message).get('event', 'unknown')
+        except orjson.JSONDecodeError:
+            return 'audio'  # L16 frame whose first byte happens to be '{'
+    if message.startswith(_MEDIA_PREFIX):
+        return 'media'
+    return orjson.loads(message).get('event', 'unknown')
+
+
+def drain_ready(websocket, limit=128):
+    """
+    Pop up to `limit` messages that have already arrived, without awaiting.
+    Uses the legacy protocol's receive queue (unbounded with max_queue=None).
+    """
+    messages = getattr(websocket, 'messages', None)
+    batch = []
+    while messages and len(batch) < limit:
+        batch.append(messages.popleft())
+    return batch
 
-async def test_websocket():
-    call_id = "test_call_12345"
-    uri = f"ws://localhost:3000/ws/voice/{call_id}"
 
-    print(f"Connecting to {uri}...")
+def handle_message(message):
+    """Log a received frame; returns True once agent audio has arrived"""
+    event = peek_event(message)
+    log.debug("📨 Received message, event type: %s", event)
+
+    if event == 'audio':
+        log.info("Received audio from agent!")
+        return True
+
+    if event == 'media':
+        # Only materialize the full frame when it will actually be logged
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("   Full data: %s", orjson.loads(message))
+        log.info("Received audio from agent!")
+        return True
+
+    return False
+
+
+async def receive_until_audio(websocket):
+    """Handle frames until agent audio arrives"""
+    while True:
+        # One await per wakeup, then handle everything already queued
+        batch = [await websocket.recv()]
+        batch.extend(drain_ready(websocket))
+        for message in batch:
+            if handle_message(message):
+                return
+
+
+async def test_websocket():
+    log.info("Connecting to %s...", URI)
 
     try:
-        async with websockets.connect(uri) as websocket:
-            print("Connected!")
+        # No size cap, no receive backpressure and no per-message deflate for media frames
+        async with websockets.connect(URI, max_size=None, max_queue=None, compression=None) as websocket:
+            log.info("Connected!")
 
             # Simulate Vonage's "start" event
-            start_event = {
-                "event": "start",
-                "start": {
-                    "streamSid": "test-stream-123"
-                }
-            }
-            print(f"Sending start event: {start_event}")
-            await websocket.send(json.dumps(start_event))
-            print("Start event sent")
-
-            # Listen for responses with timeout
+            log.info("Sending start event: %s", _START_EVENT)
+            await websocket.send(_START_EVENT)
+            log.info("Start event sent")
+
+            # Listen for responses; one timer covers the whole session
             try:
-                async with asyncio.timeout(10):  # 10 second timeout
-                    async for message in websocket:
-                        print(f"📨 Received message")
-                        data = json.loads(message)
-                        print(f"   Event type: {data.get('event', 'unknown')}")
-                        print(f"   Full data: {data}")
-
-                        if data.get('event') == 'media':
-                            print("Received audio from agent!")
-                            break
+                await asyncio.wait_for(receive_until_audio(websocket), timeout=RECEIVE_TIMEOUT_S)
             except TimeoutError:
-                print("⏱️ Timeout waiting for response")
+                log.warning("⏱️ Timeout waiting for response")
+            except websockets.ConnectionClosed:
+                log.info("Connection closed by server")
 
     except Exception as e:
-        print(f"Error: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception(f"Error: {e}")
 
 
 if __name__ == "__main__":
-    asyncio.run(test_websocket())
\ No newline at end of file
+    # libuv-backed loop; same as the server runs on
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+    # The receive loop only enqueues records; a background thread writes them out
+    log_queue = queue.SimpleQueue()
+    stderr_handler = logging.StreamHandler()
+    stderr_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, stderr_handler)
+    logging.basicConfig(level=logging.INFO, handlers=[logging.handlers.QueueHandler(log_queue)])
+
+    listener.start()
+    try:
+        asyncio.run(test_websocket())
+    finally:
+        listener.stop()
\ No newline at end of file